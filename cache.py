@@ -0,0 +1,177 @@
+# cache.py
+
+import logging
+import sqlite3
+import threading
+import time
+
+import orjson
+
+BACKENDS = ("memoria", "sqlite")
+
+
+class CacheMemoria:
+    """
+    Cache en memoria del proceso, con expiración por clave.
+    Sirve para desarrollo o despliegues de un solo worker.
+    """
+
+    def __init__(self):
+        self._datos = {}
+        self._lock = threading.Lock()
+
+    def get(self, clave: str):
+        """Retorna el valor guardado o None si no existe o expiró."""
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return None
+            valor, expira = entrada
+            if expira < time.time():
+                del self._datos[clave]
+                return None
+            return valor
+
+    def set(self, clave: str, valor, ttl: float):
+        with self._lock:
+            self._datos[clave] = (valor, time.time() + ttl)
+
+    def delete(self, clave: str):
+        with self._lock:
+            self._datos.pop(clave, None)
+
+    def set_many(self, valores: dict, ttl: float):
+        expira = time.time() + ttl
+        with self._lock:
+            for clave, valor in valores.items():
+                self._datos[clave] = (valor, expira)
+
+    def delete_many(self, claves):
+        with self._lock:
+            for clave in claves:
+                self._datos.pop(clave, None)
+
+
+class CacheSqlite:
+    """
+    Cache compartida entre procesos (workers de uvicorn) sobre un archivo SQLite
+    en modo WAL. Los valores se guardan serializados con orjson, por lo que
+    deben ser tipos JSON (dict, list, str, int, float, bool, None).
+
+    Cada hilo abre su propia conexión al primer uso.
+
+    La cache es best-effort: ante un error de SQLite (p. ej. "database is
+    locked" con varios workers escribiendo) se registra una advertencia, get
+    retorna None y la consulta sigue hacia Odoo.
+    """
+
+    # Cada cuántas escrituras se eliminan las entradas expiradas.
+    PURGA_CADA = 500
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        self._local = threading.local()
+        self._escrituras = 0
+
+    def _conexion(self) -> sqlite3.Connection:
+        conexion = getattr(self._local, "conexion", None)
+        if conexion is None:
+            conexion = sqlite3.connect(self.ruta, timeout=5, isolation_level=None)
+            conexion.execute("PRAGMA journal_mode=WAL")
+            conexion.execute("PRAGMA synchronous=NORMAL")
+            conexion.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "clave TEXT PRIMARY KEY, valor BLOB NOT NULL, expira REAL NOT NULL)"
+            )
+            self._local.conexion = conexion
+        return conexion
+
+    def get(self, clave: str):
+        """Retorna el valor guardado o None si no existe, expiró o la cache falló."""
+        try:
+            fila = self._conexion().execute(
+                "SELECT valor FROM cache WHERE clave = ? AND expira >= ?", (clave, time.time())
+            ).fetchone()
+        except sqlite3.Error as e:
+            logging.warning(f"Cache SQLite no disponible al leer '{clave}': {e}")
+            return None
+        if fila is None:
+            return None
+        return orjson.loads(fila[0])
+
+    def set(self, clave: str, valor, ttl: float):
+        try:
+            conexion = self._conexion()
+            conexion.execute(
+                "INSERT OR REPLACE INTO cache (clave, valor, expira) VALUES (?, ?, ?)",
+                (clave, orjson.dumps(valor), time.time() + ttl),
+            )
+            self._escrituras += 1
+            if self._escrituras % self.PURGA_CADA == 0:
+                conexion.execute("DELETE FROM cache WHERE expira < ?", (time.time(),))
+        except sqlite3.Error as e:
+            logging.warning(f"Cache SQLite no disponible al escribir '{clave}': {e}")
+
+    def delete(self, clave: str):
+        try:
+            self._conexion().execute("DELETE FROM cache WHERE clave = ?", (clave,))
+        except sqlite3.Error as e:
+            logging.warning(f"Cache SQLite no disponible al borrar '{clave}': {e}")
+
+    def _en_transaccion(self, sql: str, filas: list):
+        # Un solo BEGIN/COMMIT para todo el lote: una escritura al WAL y un
+        # solo turno del lock de escritura en vez de uno por clave.
+        conexion = self._conexion()
+        conexion.execute("BEGIN IMMEDIATE")
+        try:
+            conexion.executemany(sql, filas)
+            conexion.execute("COMMIT")
+        except BaseException:
+            if conexion.in_transaction:
+                conexion.execute("ROLLBACK")
+            raise
+
+    def set_many(self, valores: dict, ttl: float):
+        """Guarda varias claves con el mismo TTL en una sola transacción."""
+        if not valores:
+            return
+        expira = time.time() + ttl
+        try:
+            self._en_transaccion(
+                "INSERT OR REPLACE INTO cache (clave, valor, expira) VALUES (?, ?, ?)",
+                [(clave, orjson.dumps(valor), expira) for clave, valor in valores.items()],
+            )
+        except sqlite3.Error as e:
+            logging.warning(f"Cache SQLite no disponible al escribir {len(valores)} claves: {e}")
+
+    def delete_many(self, claves):
+        """Borra varias claves en una sola transacción."""
+        claves = list(claves)
+        if not claves:
+            return
+        try:
+            self._en_transaccion("DELETE FROM cache WHERE clave = ?", [(clave,) for clave in claves])
+        except sqlite3.Error as e:
+            logging.warning(f"Cache SQLite no disponible al borrar {len(claves)} claves: {e}")
+
+
+def crear_cache(backend: str, ruta: str = None):
+    """
+    Crea la cache configurada.
+
+    Args:
+        backend (str): 'memoria' (por proceso) o 'sqlite' (compartida entre workers).
+        ruta (str): Archivo de la base SQLite (sólo para 'sqlite').
+
+    Returns:
+        CacheMemoria | CacheSqlite: Objeto con get(clave), set(clave, valor, ttl), delete(clave)
+            y sus versiones por lote set_many(valores, ttl) y delete_many(claves).
+
+    Raises:
+        ValueError: Si el backend no es soportado.
+    """
+    if backend == "memoria":
+        return CacheMemoria()
+    if backend == "sqlite":
+        return CacheSqlite(ruta)
+    raise ValueError(f"Backend de cache no soportado: {backend}. Opciones: {', '.join(BACKENDS)}")
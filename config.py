@@ -10,5 +10,34 @@ class Settings:
     ODOO_USERNAME = os.getenv("ODOO_USERNAME")
     ODOO_PASSWORD = os.getenv("ODOO_PASSWORD")
     URL_NOTIFICACIONES = os.getenv("URL_NOTIFICACIONES")
+    NOTIFICACION_TIMEOUT = float(os.getenv("NOTIFICACION_TIMEOUT", "30.0"))  # segundos
+    ODOO_TRANSPORTE = os.getenv("ODOO_TRANSPORTE", "xmlrpc")  # 'xmlrpc' o 'jsonrpc'
+
+    # Workers de uvicorn del contenedor; los límites de concurrencia se reparten entre ellos
+    WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+    # Limitador de concurrencia hacia Odoo (AIMD), totales del contenedor
+    ODOO_CONCURRENCIA_INICIAL = int(os.getenv("ODOO_CONCURRENCIA_INICIAL", "8"))
+    ODOO_CONCURRENCIA_MINIMA = int(os.getenv("ODOO_CONCURRENCIA_MINIMA", "2"))
+    ODOO_CONCURRENCIA_MAXIMA = int(os.getenv("ODOO_CONCURRENCIA_MAXIMA", "32"))
+    ODOO_LATENCIA_OBJETIVO = float(os.getenv("ODOO_LATENCIA_OBJETIVO", "2.0"))  # segundos
+    ODOO_COLA_MAXIMA = int(os.getenv("ODOO_COLA_MAXIMA", "64"))
+    ODOO_ESPERA_MAXIMA = float(os.getenv("ODOO_ESPERA_MAXIMA", "10.0"))  # segundos en cola
+
+    # Timeouts, reintentos y circuit breaker
+    ODOO_TIMEOUT = float(os.getenv("ODOO_TIMEOUT", "30.0"))  # segundos por intento
+    ODOO_PLAZO_TOTAL = float(os.getenv("ODOO_PLAZO_TOTAL", "60.0"))  # segundos incluyendo reintentos
+    ODOO_REINTENTOS = int(os.getenv("ODOO_REINTENTOS", "3"))
+    ODOO_BACKOFF_BASE = float(os.getenv("ODOO_BACKOFF_BASE", "0.5"))
+    ODOO_BACKOFF_MAXIMO = float(os.getenv("ODOO_BACKOFF_MAXIMO", "8.0"))
+    ODOO_CIRCUITO_UMBRAL = int(os.getenv("ODOO_CIRCUITO_UMBRAL", "5"))  # fallos consecutivos
+    ODOO_CIRCUITO_ESPERA = float(os.getenv("ODOO_CIRCUITO_ESPERA", "30.0"))  # segundos abierto
+
+    # Cache compartida (auth, roles, etiquetas y solicitudes de firma)
+    CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memoria")  # 'memoria' o 'sqlite'
+    CACHE_RUTA = os.getenv("CACHE_RUTA", "/tmp/api_firma_tla_cache.sqlite3")
+    CACHE_TTL_AUTH = float(os.getenv("CACHE_TTL_AUTH", "3600"))  # segundos
+    CACHE_TTL_CATALOGOS = float(os.getenv("CACHE_TTL_CATALOGOS", "600"))  # roles y etiquetas
+    CACHE_TTL_SOLICITUDES = float(os.getenv("CACHE_TTL_SOLICITUDES", "30"))  # snapshots de sign.request
 
 settings = Settings()
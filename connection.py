@@ -1,12 +1,18 @@
 # connection.py
 
 import os
-import json
+import datetime
 import logging
+from concurrent.futures import ThreadPoolExecutor
+import orjson
+import requests
 from config import settings
-from xmlrpc.client import ServerProxy
 from models import FirmaRequest
 from utils import vigencia_dias
+from limiter import LimitadorConcurrencia, ProxyLimitado
+from resilience import CircuitBreaker, ProxyResiliente
+from transport import crear_proxy
+from cache import crear_cache
 
 db = settings.ODOO_DB
 url = settings.ODOO_URL
@@ -14,9 +20,68 @@ username = settings.ODOO_USERNAME
 password = settings.ODOO_PASSWORD
 url_notificaciones = settings.URL_NOTIFICACIONES
 
+def por_worker(total: int) -> int:
+    """
+    Reparte un límite del contenedor entre los workers de uvicorn
+    (WEB_CONCURRENCY), ya que cada proceso tiene su propio limitador.
+    """
+    return max(1, total // max(1, settings.WEB_CONCURRENCY))
+
+limitador_odoo = LimitadorConcurrencia(
+    inicial=por_worker(settings.ODOO_CONCURRENCIA_INICIAL),
+    minimo=por_worker(settings.ODOO_CONCURRENCIA_MINIMA),
+    maximo=por_worker(settings.ODOO_CONCURRENCIA_MAXIMA),
+    latencia_objetivo=settings.ODOO_LATENCIA_OBJETIVO,
+    cola_maxima=por_worker(settings.ODOO_COLA_MAXIMA),
+    espera_maxima=settings.ODOO_ESPERA_MAXIMA,
+)
+
+circuito_odoo = CircuitBreaker(
+    umbral=settings.ODOO_CIRCUITO_UMBRAL,
+    espera=settings.ODOO_CIRCUITO_ESPERA,
+)
+
+# Compartida entre workers cuando CACHE_BACKEND=sqlite
+cache = crear_cache(settings.CACHE_BACKEND, settings.CACHE_RUTA)
+
+# Campos de sign.request expuestos por /info y proyectables en /solicitudes
+CAMPOS_SIGN_REQUEST = [
+    'id', 'subject', 'reference', 'state', 'active',
+    'display_name', 'nb_wait', 'nb_closed', 'nb_total', 'progress',
+    'validity', 'reminder_enabled', 'reminder', 'last_reminder',
+    'request_item_ids', 'request_item_infos', 'create_date',
+    'completion_date', 'last_action_date', 'template_id', 'access_token'
+]
+
+def conectar(servicio: str):
+    """
+    Crea el proxy hacia un servicio de Odoo ('common' u 'object') usando el
+    transporte configurado en ODOO_TRANSPORTE (XML-RPC o JSON-RPC).
+
+    Cada llamada pasa por el circuit breaker, se reintenta con backoff si es
+    idempotente, y cada intento respeta el timeout y el limitador de concurrencia.
+
+    Args:
+        servicio (str): Nombre del servicio de Odoo.
+
+    Returns:
+        ProxyResiliente: Proxy protegido hacia Odoo.
+    """
+    proxy = crear_proxy(url, servicio, settings.ODOO_TRANSPORTE, settings.ODOO_TIMEOUT,
+                        conexiones=limitador_odoo.maximo)
+    return ProxyResiliente(
+        ProxyLimitado(proxy, limitador_odoo),
+        circuito_odoo,
+        reintentos=settings.ODOO_REINTENTOS,
+        backoff_base=settings.ODOO_BACKOFF_BASE,
+        backoff_maximo=settings.ODOO_BACKOFF_MAXIMO,
+        plazo_total=settings.ODOO_PLAZO_TOTAL,
+    )
+
 def authenticate():
     """
     Se autentica contra el servidor Odoo usando las credenciales del .env.
+    El UID queda en cache (CACHE_TTL_AUTH) para no autenticar en cada llamada.
 
     Returns:
         int: UID del usuario autenticado.
@@ -24,12 +89,71 @@ def authenticate():
     Raises:
         Exception: Si falla la autenticación.
     """
-    common = ServerProxy(f"{url}/xmlrpc/2/common")
+    clave = f"auth:{db}:{username}"
+    uid = cache.get(clave)
+    if uid:
+        return uid
+
+    common = conectar("common")
     uid = common.authenticate(db, username, password, {})
     if not uid:
         raise Exception("Fallo de autenticación con Odoo")
+    cache.set(clave, uid, settings.CACHE_TTL_AUTH)
     return uid # Devuelve el uid
 
+def obtener_mapa_roles(uid, models):
+    """
+    Obtiene el mapa nombre -> ID de los roles de firma (sign.item.role), usando la cache.
+
+    Args:
+        uid (int): UID autenticado.
+        models: Conexión a Odoo.
+
+    Returns:
+        dict: Nombre del rol -> ID.
+    """
+    role_map = cache.get("roles")
+    if role_map is None:
+        roles = models.execute_kw(db, uid, password, 'sign.item.role', 'search_read', [[]], {'fields': ['id', 'name']})
+        role_map = {r['name']: r['id'] for r in roles}
+        cache.set("roles", role_map, settings.CACHE_TTL_CATALOGOS)
+    return role_map
+
+def precargar_tags(uid, models):
+    """
+    Carga en la cache el índice nombre -> ID de todas las etiquetas de plantilla,
+    el mismo que usa create_tag.
+
+    Returns:
+        int: Cantidad de etiquetas cargadas.
+    """
+    tags = models.execute_kw(db, uid, password, 'sign.template.tag', 'search_read', [[]], {'fields': ['id', 'name']})
+    cache.set_many({f"tag:{tag['name']}": tag['id'] for tag in tags}, settings.CACHE_TTL_CATALOGOS)
+    return len(tags)
+
+def precalentar():
+    """
+    Deja el servicio listo para atender con la latencia normal: abre el pool de
+    conexiones hacia Odoo, autentica y precarga los roles y etiquetas en la cache.
+
+    Returns:
+        dict: Resumen de lo precargado.
+
+    Raises:
+        Exception: Si Odoo no responde o falla la autenticación.
+    """
+    # Abre varias conexiones en paralelo para que queden en el pool
+    conexiones = limitador_odoo.limite
+    with ThreadPoolExecutor(max_workers=conexiones) as executor:
+        list(executor.map(lambda _: conectar("common").version(), range(conexiones)))
+
+    uid = authenticate()
+    models = conectar("object")
+    roles = obtener_mapa_roles(uid, models)
+    tags = precargar_tags(uid, models)
+
+    return {"roles": len(roles), "tags": tags, "conexiones": conexiones}
+
 def create_partners(signing_parties, uid, password, models):
     """
     Crea o actualiza los partners (firmantes) en Odoo usando el RUT (vat) como identificador único.
@@ -85,7 +209,7 @@ def create_partners(signing_parties, uid, password, models):
 
 def create_tag(tag, uid, password, models):
     """
-    Crea una etiqueta para el template si no existe.
+    Crea una etiqueta para el template si no existe. El ID queda en cache por nombre.
 
     Args:
         tag (str): Nombre de la etiqueta.
@@ -96,11 +220,17 @@ def create_tag(tag, uid, password, models):
     Returns:
         int: ID de la etiqueta en Odoo.
     """
+    clave = f"tag:{tag}"
+    tag_id = cache.get(clave)
+    if tag_id:
+        return tag_id
+
     existing = models.execute_kw(db, uid, password, 'sign.template.tag', 'search', [[('name', '=', tag)]])
     if not existing:
         tag_id = models.execute_kw(db, uid, password, 'sign.template.tag', 'create', [{'name': tag}])
     else:
         tag_id = existing[0]
+    cache.set(clave, tag_id, settings.CACHE_TTL_CATALOGOS)
     return tag_id
 
 def create_attachment(document_base64, uid, password, models):
@@ -276,11 +406,10 @@ def procesar_solicitud_firma(data: FirmaRequest):
         dict: Respuesta con el ID del request o error.
     """
     uid = authenticate()
-    models = ServerProxy(f"{url}/xmlrpc/2/object")
+    models = conectar("object")
 
     # Obtener roles
-    roles = models.execute_kw(db, uid, password, 'sign.item.role', 'search_read', [[]], {'fields': ['id', 'name']})
-    role_map = {r['name']: r['id'] for r in roles}
+    role_map = obtener_mapa_roles(uid, models)
 
     trabajador_role_id = role_map.get('Employee') # Trabajador
     empleador_role_id = role_map.get('User') # Empresa
@@ -310,7 +439,7 @@ def obtener_sign_request(id: int):
         dict: Diccionario con 'state' y 'reference'.
     """
     uid = authenticate()
-    models = ServerProxy(f'{url}/xmlrpc/2/object')
+    models = conectar("object")
 
     result = models.execute_kw(
         db, uid, password,
@@ -336,7 +465,7 @@ def traer_documentos_firmados(id: int) -> dict:
         dict: Diccionario con 'documento' y 'certificado' en base64.
     """
     uid = authenticate()
-    models = ServerProxy(f'{url}/xmlrpc/2/object')
+    models = conectar("object")
 
     sign_request = models.execute_kw(
         db, uid, password,
@@ -376,14 +505,27 @@ def notificar_firma(payload: dict):
     Returns:
         str: Mensaje de éxito o lanza error.
     """
-    import requests
-
     headers = {'Content-Type': 'application/json'}
-    response = requests.post(url_notificaciones, headers=headers, data=json.dumps(payload))
+    response = requests.post(url_notificaciones, headers=headers, data=orjson.dumps(payload),
+                             timeout=settings.NOTIFICACION_TIMEOUT)
     response.raise_for_status()
     return "Notificación enviada exitosamente"
 
 
+def motivo_no_cancelable(estado: str):
+    """
+    Indica por qué una solicitud de firma no se puede cancelar según su estado.
+
+    Returns:
+        str | None: Mensaje para el cliente, o None si se puede cancelar.
+    """
+    if estado == 'canceled':
+        return "El documento ya está cancelado."
+    elif estado == 'signed':
+        return "El documento está firmado."
+    return None
+
+
 def cancelar_documento_firma(doc_id: int):
     """
     Cancela un documento de solicitud de firma (sign.request) en Odoo,
@@ -400,7 +542,7 @@ def cancelar_documento_firma(doc_id: int):
         Exception: Para otros errores generales de conexión o ejecución.
     """
     uid = authenticate()
-    models = ServerProxy(f'{url}/xmlrpc/2/object')
+    models = conectar("object")
 
     documento = models.execute_kw(
         db, uid, password,
@@ -412,35 +554,102 @@ def cancelar_documento_firma(doc_id: int):
     if not documento:
         raise ValueError("No se encontró el documento con el ID proporcionado.")
 
-    estado = documento[0]['state']
-
-    if estado == 'canceled':
-        return {"message": "El documento ya está cancelado."}
-    elif estado == 'signed':
-        return {"message": "El documento está firmado."}
+    mensaje = motivo_no_cancelable(documento[0]['state'])
+    if mensaje:
+        return {"message": mensaje}
 
     models.execute_kw(
         db, uid, password,
         'sign.request', 'write',
         [doc_id, {'state': 'canceled'}]
     )
+    cache.delete(f"sign.request:{doc_id}")
 
     return {"message": "El documento se ha cancelado exitosamente."}
 
 
+def cancelar_documentos_firma(ids: list = None, tag: str = None):
+    """
+    Cancela en bloque varias solicitudes de firma (sign.request), indicadas por
+    ID y/o por etiqueta de plantilla. Lee todos los estados con un solo
+    search_read y cancela todos los elegibles con un solo write.
+
+    Si se indican ambos, sólo se cancelan los IDs que además tienen la etiqueta;
+    los que existen pero no la tienen se informan como tales.
+
+    Args:
+        ids (List[int]): IDs de las solicitudes a cancelar.
+        tag (str): Nombre de la etiqueta (template_id.tag_ids).
+
+    Returns:
+        dict: 'resultados' con el mensaje por cada ID, con las mismas reglas
+            que cancelar_documento_firma.
+
+    Raises:
+        ValueError: Si no se indica ni 'ids' ni 'tag'.
+    """
+    if not ids and not tag:
+        raise ValueError("Debe indicar 'ids' o 'tag'.")
+
+    uid = authenticate()
+    models = conectar("object")
+
+    filtro_tag = ('template_id.tag_ids.name', '=', tag)
+    if ids:
+        ids = list(dict.fromkeys(ids))  # sin duplicados, en el orden recibido
+        domain = [('id', 'in', ids)]
+    else:
+        domain = [filtro_tag]
+
+    documentos = models.execute_kw(
+        db, uid, password,
+        'sign.request', 'search_read',
+        [domain],
+        {'fields': ['id', 'state'], 'order': 'id asc'}
+    )
+    estados = {d['id']: d['state'] for d in documentos}
+
+    # Con IDs y etiqueta, se distinguen los IDs existentes que no tienen la etiqueta
+    con_tag = set(estados)
+    if ids and tag and estados:
+        con_tag = set(models.execute_kw(
+            db, uid, password,
+            'sign.request', 'search',
+            [[('id', 'in', list(estados)), filtro_tag]]
+        ))
+
+    resultados = []
+    cancelables = []
+    for doc_id in (ids or estados):
+        if doc_id not in estados:
+            mensaje = "No se encontró el documento con el ID proporcionado."
+        elif doc_id not in con_tag:
+            mensaje = "El documento no tiene la etiqueta indicada."
+        else:
+            mensaje = motivo_no_cancelable(estados[doc_id])
+            if not mensaje:
+                cancelables.append(doc_id)
+                mensaje = "El documento se ha cancelado exitosamente."
+        resultados.append({"id": doc_id, "message": mensaje})
+
+    if cancelables:
+        models.execute_kw(
+            db, uid, password,
+            'sign.request', 'write',
+            [cancelables, {'state': 'canceled'}]
+        )
+        cache.delete_many(f"sign.request:{doc_id}" for doc_id in cancelables)
+
+    return {"resultados": resultados}
+
+
 def buscar_documento(models, uid, request_id):
     """Busca el documento de firma por su ID."""
     documentos = models.execute_kw(
         db, uid, password,
         'sign.request', 'search_read',
         [[('id', '=', request_id)]],
-        {'fields': [
-            'id', 'subject', 'reference', 'state', 'active',
-            'display_name', 'nb_wait', 'nb_closed', 'nb_total', 'progress',
-            'validity', 'reminder_enabled', 'reminder', 'last_reminder',
-            'request_item_ids', 'request_item_infos', 'create_date',
-            'completion_date', 'last_action_date', 'template_id', 'access_token'
-        ]}
+        {'fields': CAMPOS_SIGN_REQUEST}
     )
     if not documentos:
         raise ValueError(f"No se encontró ningún documento con ID {request_id}")
@@ -466,7 +675,8 @@ def obtener_comentario_rechazo(models, uid, request_id):
 def obtener_info_firma(request_id: int):
     """
     Obtiene la información detallada de una solicitud de firma en Odoo,
-    incluyendo el comentario de rechazo si existe.
+    incluyendo el comentario de rechazo si existe. El resultado queda en
+    cache por CACHE_TTL_SOLICITUDES segundos.
 
     Returns:
         dict: Datos del documento de firma, con posible campo 'rechazo_comentario'.
@@ -474,16 +684,85 @@ def obtener_info_firma(request_id: int):
     Raises:
         ValueError: Si no se encuentra un documento con el ID proporcionado.
     """
+    clave = f"sign.request:{request_id}"
+    info = cache.get(clave)
+    if info is not None:
+        return info
+
     uid = authenticate()
-    models = ServerProxy(f'{url}/xmlrpc/2/object')
+    models = conectar("object")
 
     documento = buscar_documento(models, uid, request_id)
     comentario_de_rechazo = obtener_comentario_rechazo(models, uid, request_id)
 
-    return {
+    info = {
         **documento,
         'rechazo_comentario': comentario_de_rechazo
     }
+    cache.set(clave, info, settings.CACHE_TTL_SOLICITUDES)
+    return info
+
+
+def listar_solicitudes_firma(tag: str = None, estado: str = None, desde: datetime.date = None,
+                             hasta: datetime.date = None, despues_de_id: int = 0,
+                             limite: int = 50, campos: list = None):
+    """
+    Lista solicitudes de firma (sign.request) filtradas por etiqueta, estado y
+    rango de fecha de creación, paginando por ID (keyset): cada página trae
+    los registros con ID mayor a `despues_de_id`, en orden ascendente.
+
+    Args:
+        tag (str): Nombre de la etiqueta de la plantilla (template_id.tag_ids).
+        estado (str): Estado en Odoo ('shared', 'sent', 'signed', 'canceled', 'expired').
+        desde (date): Fecha de creación mínima (inclusive).
+        hasta (date): Fecha de creación máxima (inclusive).
+        despues_de_id (int): Cursor; ID del último registro de la página anterior.
+        limite (int): Cantidad máxima de registros por página.
+        campos (List[str]): Campos a devolver (subconjunto de CAMPOS_SIGN_REQUEST).
+            Siempre se incluye 'id'. Por defecto: id, reference, state.
+
+    Returns:
+        dict: 'items' con los registros y 'siguiente' con el cursor de la
+            próxima página (None si no hay más).
+
+    Raises:
+        ValueError: Si se piden campos no permitidos.
+    """
+    campos = campos or ['id', 'reference', 'state']
+    no_permitidos = set(campos) - set(CAMPOS_SIGN_REQUEST)
+    if no_permitidos:
+        raise ValueError(f"Campos no permitidos: {', '.join(sorted(no_permitidos))}")
+    if 'id' not in campos:
+        campos = ['id', *campos]
+
+    domain = [('id', '>', despues_de_id)]
+    if tag:
+        domain.append(('template_id.tag_ids.name', '=', tag))
+    if estado:
+        domain.append(('state', '=', estado))
+    if desde:
+        domain.append(('create_date', '>=', desde.strftime('%Y-%m-%d 00:00:00')))
+    if hasta:
+        siguiente_dia = hasta + datetime.timedelta(days=1)
+        domain.append(('create_date', '<', siguiente_dia.strftime('%Y-%m-%d 00:00:00')))
+
+    uid = authenticate()
+    models = conectar("object")
+
+    # Se pide un registro extra para saber si existe otra página
+    items = models.execute_kw(
+        db, uid, password,
+        'sign.request', 'search_read',
+        [domain],
+        {'fields': campos, 'order': 'id asc', 'limit': limite + 1}
+    )
+
+    siguiente = None
+    if len(items) > limite:
+        items = items[:limite]
+        siguiente = items[-1]['id']
+
+    return {"items": items, "siguiente": siguiente}
 
 
 def obtener_rol_por_id(role_id: int):
@@ -497,7 +776,7 @@ def obtener_rol_por_id(role_id: int):
         dict: Datos del rol encontrado.
     """
     uid = authenticate()
-    models = ServerProxy(f'{url}/xmlrpc/2/object')
+    models = conectar("object")
 
     roles = models.execute_kw(
         db, uid, password,
@@ -523,7 +802,7 @@ def obtener_tag_por_id(tag_id: int):
         dict: Datos de la etiqueta encontrada.
     """
     uid = authenticate()
-    models = ServerProxy(f'{url}/xmlrpc/2/object')
+    models = conectar("object")
 
     tags = models.execute_kw(
         db, uid, password,
@@ -554,7 +833,7 @@ def editar_tag(tag_id: int, nuevo_nombre: str):
         Exception: Para otros errores generales de conexión o ejecución.
     """
     uid = authenticate()
-    models = ServerProxy(f'{url}/xmlrpc/2/object')
+    models = conectar("object")
 
     tag = models.execute_kw(
         db, uid, password,
@@ -571,5 +850,6 @@ def editar_tag(tag_id: int, nuevo_nombre: str):
         'sign.template.tag', 'write',
         [tag_id, {'name': nuevo_nombre}]
     )
+    cache.delete(f"tag:{tag[0]['name']}")
 
     return {"message": "El tag se ha actualizado exitosamente."}
@@ -0,0 +1,235 @@
+# limiter.py
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+from http.client import HTTPException
+from xmlrpc.client import ProtocolError
+from plazos import tiempo_restante
+
+
+class OdooSaturado(Exception):
+    """
+    Se lanza cuando no es posible enviar la llamada a Odoo sin sobrecargarlo.
+
+    Attributes:
+        status_code (int): Código HTTP con el que debe responder la API (429 o 503).
+        retry_after (int): Segundos sugeridos al cliente antes de reintentar.
+    """
+
+    def __init__(self, mensaje: str, status_code: int = 503, retry_after: int = 1):
+        super().__init__(mensaje)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def es_error_de_sobrecarga(error: BaseException) -> bool:
+    """
+    Indica si un error refleja un problema de capacidad/red de Odoo
+    (timeouts, conexiones caídas, 502/503/504) y no un error de negocio (Fault).
+    """
+    if isinstance(error, ProtocolError):
+        return error.errcode in (429, 502, 503, 504)
+    return isinstance(error, (OSError, HTTPException))
+
+
+class LimitadorConcurrencia:
+    """
+    Limita la cantidad de llamadas simultáneas a Odoo ajustando el límite
+    según la latencia observada (AIMD):
+
+    - Cada llamada que responde bajo la latencia objetivo suma 1/limite
+      (aprox. +1 por cada "ventana" completa de llamadas).
+    - Una llamada lenta o fallida por sobrecarga multiplica el límite por
+      el factor de reducción, a lo más una vez por ventana: se ignoran las
+      llamadas que comenzaron antes de la última reducción, porque ya
+      reflejaban la carga anterior.
+
+    Las llamadas que transfieren archivos (ver ProxyLimitado) no aportan
+    señal de latencia: su duración depende del tamaño, no de la carga de Odoo.
+
+    Cuando el límite está copado, las llamadas esperan en cola hasta
+    `espera_maxima` segundos. Si la cola está llena se rechaza de inmediato
+    con 429; si vence el plazo en cola se rechaza con 503.
+
+    Las solicitudes de la API se admiten una sola vez al comenzar (ver
+    admision): el cupo se mantiene hasta que terminan y sus llamadas a Odoo
+    sólo aportan la señal de latencia, sin volver a hacer cola.
+    """
+
+    def __init__(self, inicial: int, minimo: int, maximo: int, latencia_objetivo: float,
+                 cola_maxima: int, espera_maxima: float, factor_reduccion: float = 0.9):
+        self.minimo = max(1, minimo)
+        self.maximo = max(self.minimo, maximo)
+        self.latencia_objetivo = latencia_objetivo
+        self.cola_maxima = cola_maxima
+        self.espera_maxima = espera_maxima
+        self.factor_reduccion = factor_reduccion
+
+        self._limite = float(min(max(inicial, self.minimo), self.maximo))
+        self._en_vuelo = 0
+        self._en_cola = 0
+        self._latencia_media = latencia_objetivo
+        self._ultima_reduccion = float("-inf")
+        self._cond = threading.Condition()
+        self._local = threading.local()
+
+    @property
+    def limite(self) -> int:
+        return int(self._limite)
+
+    def _retry_after(self) -> int:
+        # Estimación simple: lo que tarda en vaciarse la cola actual.
+        rondas = (self._en_cola + self._en_vuelo) / max(1, self.limite)
+        return max(1, math.ceil(rondas * self._latencia_media))
+
+    def adquirir(self):
+        """
+        Reserva un cupo para llamar a Odoo, esperando en cola si es necesario.
+        La espera se acota al plazo de la llamada en curso, si lo hay.
+
+        Raises:
+            OdooSaturado: Si la cola está llena (429) o se agota la espera (503).
+        """
+        espera = tiempo_restante(self.espera_maxima)
+        if espera <= 0:
+            raise OdooSaturado("Plazo de la llamada a Odoo agotado.",
+                               status_code=503, retry_after=1)
+        plazo = time.monotonic() + espera
+        with self._cond:
+            if self._en_cola == 0 and self._en_vuelo < self.limite:
+                self._en_vuelo += 1
+                return
+
+            if self._en_cola >= self.cola_maxima:
+                raise OdooSaturado("Odoo está saturado, intente más tarde.",
+                                   status_code=429, retry_after=self._retry_after())
+
+            self._en_cola += 1
+            try:
+                while self._en_vuelo >= self.limite:
+                    restante = plazo - time.monotonic()
+                    if restante <= 0:
+                        raise OdooSaturado("Tiempo de espera agotado en la cola hacia Odoo.",
+                                           status_code=503, retry_after=self._retry_after())
+                    self._cond.wait(restante)
+                self._en_vuelo += 1
+            finally:
+                self._en_cola -= 1
+
+    def liberar(self, latencia: float, sobrecarga: bool = False, medir_latencia: bool = True):
+        """
+        Libera el cupo y ajusta el límite según la latencia y el resultado de la llamada.
+
+        Args:
+            latencia (float): Duración de la llamada en segundos.
+            sobrecarga (bool): True si la llamada falló por un error de capacidad/red.
+            medir_latencia (bool): False si la duración no indica la carga de Odoo
+                (p. ej. subida o descarga de un PDF); sólo cuenta `sobrecarga`.
+        """
+        with self._cond:
+            self._en_vuelo -= 1
+            self._ajustar(latencia, sobrecarga, medir_latencia)
+
+    def registrar(self, latencia: float, sobrecarga: bool = False, medir_latencia: bool = True):
+        """
+        Ajusta el límite según una llamada hecha con un cupo ya tomado
+        (solicitud admitida), sin liberarlo. Mismos argumentos que liberar.
+        """
+        with self._cond:
+            self._ajustar(latencia, sobrecarga, medir_latencia)
+
+    def _ajustar(self, latencia: float, sobrecarga: bool, medir_latencia: bool):
+        # Debe llamarse con self._cond tomado.
+        ahora = time.monotonic()
+        inicio = ahora - latencia
+        if medir_latencia:
+            self._latencia_media = 0.8 * self._latencia_media + 0.2 * latencia
+
+        lenta = medir_latencia and latencia > self.latencia_objetivo
+        if sobrecarga or lenta:
+            if inicio >= self._ultima_reduccion:
+                self._limite = max(self.minimo, self._limite * self.factor_reduccion)
+                self._ultima_reduccion = ahora
+        elif medir_latencia:
+            self._limite = min(self.maximo, self._limite + 1 / self._limite)
+
+        self._cond.notify(max(1, self.limite - self._en_vuelo))
+
+    @contextmanager
+    def cupo(self, medir_latencia: bool = True):
+        """
+        Context manager que envuelve una llamada a Odoo con adquirir/liberar.
+        Si el hilo ya fue admitido (ver admision), no toma otro cupo: sólo
+        registra la latencia de la llamada.
+        """
+        admitido = getattr(self._local, "admitido", False)
+        if not admitido:
+            self.adquirir()
+        inicio = time.monotonic()
+        sobrecarga = False
+        try:
+            yield
+        except BaseException as e:
+            sobrecarga = es_error_de_sobrecarga(e)
+            raise
+        finally:
+            if admitido:
+                self.registrar(time.monotonic() - inicio, sobrecarga, medir_latencia)
+            else:
+                self.liberar(time.monotonic() - inicio, sobrecarga, medir_latencia)
+
+    @contextmanager
+    def admision(self):
+        """
+        Admite una solicitud completa de la API: toma un cupo (esperando en cola
+        si es necesario) y lo mantiene hasta que la solicitud termina. Las
+        llamadas a Odoo hechas dentro del bloque no vuelven a hacer cola, así
+        que un flujo ya iniciado (p. ej. adjunto y plantilla ya creados) no
+        se rechaza a mitad de camino. Anidarla en el mismo hilo no toma otro cupo.
+
+        Raises:
+            OdooSaturado: Si la cola está llena (429) o se agota la espera (503).
+        """
+        if getattr(self._local, "admitido", False):
+            yield
+            return
+        self.adquirir()
+        self._local.admitido = True
+        try:
+            yield
+        finally:
+            self._local.admitido = False
+            with self._cond:
+                self._en_vuelo -= 1
+                self._cond.notify(max(1, self.limite - self._en_vuelo))
+
+
+def transfiere_archivos(nombre: str, args: tuple) -> bool:
+    """
+    Indica si una llamada mueve archivos (ir.attachment, cuyo campo 'datas'
+    trae el PDF en base64). En execute_kw el modelo es el cuarto argumento.
+    """
+    return nombre == 'execute_kw' and len(args) > 3 and args[3] == 'ir.attachment'
+
+
+class ProxyLimitado:
+    """
+    Envuelve un proxy de Odoo (p. ej. ServerProxy) para que cada llamada
+    remota pase por el limitador de concurrencia. Dentro de una solicitud
+    admitida la llamada sólo se mide; fuera de ella toma su propio cupo.
+    """
+
+    def __init__(self, proxy, limitador: LimitadorConcurrencia):
+        self._proxy = proxy
+        self._limitador = limitador
+
+    def __getattr__(self, nombre):
+        metodo = getattr(self._proxy, nombre)
+
+        def llamada(*args):
+            with self._limitador.cupo(medir_latencia=not transfiere_archivos(nombre, args)):
+                return metodo(*args)
+
+        return llamada
@@ -1,12 +1,114 @@
 # main.py
 
+import datetime
+import logging
+import threading
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+from anyio import to_thread
 from fastapi import FastAPI, HTTPException, Query
-from models import FirmaRequest
-from connection import (procesar_solicitud_firma, obtener_info_firma, obtener_rol_por_id, obtener_tag_por_id, editar_tag,
-                        cancelar_documento_firma, obtener_sign_request, traer_documentos_firmados, notificar_firma)
+from fastapi.responses import ORJSONResponse
+from models import (FirmaRequest, CancelacionMasivaRequest, InfoFirmaResponse, SolicitudesResponse,
+                    CancelacionMasivaResponse)
+from connection import (procesar_solicitud_firma, obtener_info_firma, listar_solicitudes_firma, obtener_rol_por_id, obtener_tag_por_id, editar_tag,
+                        cancelar_documento_firma, cancelar_documentos_firma, obtener_sign_request,
+                        traer_documentos_firmados, notificar_firma, precalentar, limitador_odoo)
 from utils import mapear_estado_firma
+from limiter import OdooSaturado
+from transport import cerrar_conexiones
+
+# Estado de preparación del servicio, reportado por /salud
+estado_servicio = {"listo": False, "detalle": None, "error": None}
+
+# Tomado mientras hay un precalentamiento en curso
+_precalentando = threading.Lock()
+
+# Hilos extra para endpoints que no pasan por el limitador (/salud, notificaciones)
+HILOS_EXTRA = 8
+
+
+def ejecutar_precalentamiento():
+    """
+    Ejecuta el precalentamiento contra Odoo y actualiza el estado de preparación.
+    Debe llamarse con _precalentando tomado; lo libera al terminar.
+    """
+    try:
+        estado_servicio["detalle"] = precalentar()
+        estado_servicio["listo"] = True
+        estado_servicio["error"] = None
+        logging.info(f"Servicio listo: {estado_servicio['detalle']}")
+    except Exception as e:
+        estado_servicio["error"] = str(e)
+        logging.error(f"❌ Error al precalentar la conexión con Odoo: {e}")
+    finally:
+        _precalentando.release()
+
+
+def iniciar_precalentamiento():
+    """
+    Lanza el precalentamiento en un hilo de fondo, salvo que ya haya uno en curso.
+    """
+    if not _precalentando.acquire(blocking=False):
+        return
+    threading.Thread(target=ejecutar_precalentamiento, name="precalentamiento", daemon=True).start()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Al iniciar, precalienta en segundo plano la conexión con Odoo (pool, uid,
+    roles y etiquetas); /salud responde 503 hasta que termine. Al apagar,
+    cierra las conexiones abiertas.
+
+    También agranda el pool de hilos de anyio (40 por defecto), donde corren
+    los endpoints síncronos, para que quepan todas las solicitudes admitidas
+    y en cola del limitador. Si no, el exceso esperaría en la cola de anyio,
+    sin límite ni plazo, y el limitador nunca respondería 429.
+    """
+    hilos = to_thread.current_default_thread_limiter()
+    hilos.total_tokens = max(hilos.total_tokens,
+                             limitador_odoo.maximo + limitador_odoo.cola_maxima + HILOS_EXTRA)
+    iniciar_precalentamiento()
+    yield
+    cerrar_conexiones()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+# Cada endpoint que llama a Odoo entra con `with limitador_odoo.admision():`,
+# de modo que la solicitud completa se admite (o rechaza con 429/503) una sola
+# vez al comenzar y no a mitad de un flujo de varias llamadas.
+
+def rechazo_por_saturacion(e: OdooSaturado) -> HTTPException:
+    """
+    Convierte un rechazo del limitador de Odoo en una respuesta 429/503 con Retry-After.
+    """
+    return HTTPException(status_code=e.status_code, detail=str(e),
+                         headers={"Retry-After": str(e.retry_after)})
+
+
+@app.get("/salud")
+def salud():
+    """
+    Indica si el servicio está listo para atender (conexión con Odoo precalentada).
+    Si el precalentamiento falló, lanza uno nuevo en segundo plano (a lo más
+    uno a la vez) y responde 503 sin esperarlo.
+
+    Returns:
+        dict: Estado 'ok' y resumen de lo precargado.
+
+    Raises:
+        HTTPException: 503 con Retry-After si el servicio aún no está listo.
+    """
+    if not estado_servicio["listo"]:
+        if estado_servicio["error"]:
+            iniciar_precalentamiento()
+        raise HTTPException(status_code=503, detail=estado_servicio["error"] or "Precalentando conexión con Odoo.",
+                            headers={"Retry-After": "5"})
+    return {"status": "ok", **estado_servicio["detalle"]}
 
-app = FastAPI()
 
 @app.post("/conexion")
 def solicitud_firma(data: FirmaRequest):
@@ -20,7 +122,10 @@ def solicitud_firma(data: FirmaRequest):
         dict: Resultado de la operación, usualmente con el ID de la solicitud.
     """
     try:
-        return procesar_solicitud_firma(data)
+        with limitador_odoo.admision():
+            return procesar_solicitud_firma(data)
+    except OdooSaturado as e:
+        raise rechazo_por_saturacion(e)
     except Exception as e:
         print("❌ Error interno:", e)  # Esto imprime el error exacto
         raise HTTPException(status_code=500, detail=str(e))
@@ -32,10 +137,11 @@ def recuperacion_manual(id: int = Query(..., description="ID de la firma a recup
     Recupera manualmente una solicitud de firma y notifica su estado.
     """
     try:
-        sign_request = obtener_sign_request(id)
-        estado = mapear_estado_firma(sign_request['state'])
+        with limitador_odoo.admision():
+            sign_request = obtener_sign_request(id)
+            estado = mapear_estado_firma(sign_request['state'])
 
-        documentos = traer_documentos_firmados(id) if estado == 'FF' else {}
+            documentos = traer_documentos_firmados(id) if estado == 'FF' else {}
 
         payload = {
             "tag": "tag",
@@ -48,6 +154,8 @@ def recuperacion_manual(id: int = Query(..., description="ID de la firma a recup
         notificar_firma(payload)
         return {"message": "Recuperación manual procesada exitosamente."}
 
+    except OdooSaturado as e:
+        raise rechazo_por_saturacion(e)
     except Exception as e:
         import logging
         logging.error(f"❌ Error en /recuperacion_manual: {e}")
@@ -60,10 +168,11 @@ def recuperacion_webhook(id: int = Query(..., description="ID de la firma a recu
     Recupera una solicitud de firma activada por webhook y notifica su estado.
     """
     try:
-        sign_request = obtener_sign_request(id)
-        estado = mapear_estado_firma(sign_request['state'])
+        with limitador_odoo.admision():
+            sign_request = obtener_sign_request(id)
+            estado = mapear_estado_firma(sign_request['state'])
 
-        documentos = traer_documentos_firmados(id)
+            documentos = traer_documentos_firmados(id)
 
         payload = {
             "tag": "tag",
@@ -76,6 +185,8 @@ def recuperacion_webhook(id: int = Query(..., description="ID de la firma a recu
         notificar_firma(payload)
         return {"message": "Recuperación webhook procesada exitosamente."}
 
+    except OdooSaturado as e:
+        raise rechazo_por_saturacion(e)
     except Exception as e:
         import logging
         logging.error(f"❌ Error en /recuperacion_webhook: {e}")
@@ -97,13 +208,46 @@ def cancelar_firma(id: int = Query(...)):
         HTTPException: Si ocurre un error al intentar cancelar la solicitud.
     """
     try:
-        return cancelar_documento_firma(id)
+        with limitador_odoo.admision():
+            return cancelar_documento_firma(id)
+    except OdooSaturado as e:
+        raise rechazo_por_saturacion(e)
     except Exception as e:
         print("❌ Error en /cancelar:", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/info")
+# Los endpoints con respuestas grandes devuelven ORJSONResponse directamente:
+# FastAPI no pasa el contenido por jsonable_encoder y el response_model
+# queda sólo como documentación en OpenAPI.
+
+@app.put("/cancelar_masivo", response_model=CancelacionMasivaResponse, response_class=ORJSONResponse)
+def cancelar_firma_masivo(data: CancelacionMasivaRequest):
+    """
+    Cancela en bloque las solicitudes de firma indicadas por IDs y/o etiqueta.
+
+    Args:
+        data (CancelacionMasivaRequest): IDs y/o etiqueta de las solicitudes a cancelar.
+
+    Returns:
+        dict: Resultado por cada ID ('resultados': [{'id', 'message'}]).
+
+    Raises:
+        HTTPException: Si ocurre un error al intentar cancelar las solicitudes.
+    """
+    try:
+        with limitador_odoo.admision():
+            return ORJSONResponse(cancelar_documentos_firma(data.ids, data.tag))
+    except OdooSaturado as e:
+        raise rechazo_por_saturacion(e)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print("❌ Error en /cancelar_masivo:", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/info", response_model=InfoFirmaResponse, response_class=ORJSONResponse)
 def info(id: int = Query(..., description="ID de la solicitud de firma en Odoo")):
     """
     Devuelve la información detallada de una solicitud de firma desde Odoo.
@@ -115,19 +259,53 @@ def info(id: int = Query(..., description="ID de la solicitud de firma en Odoo")
         dict: Datos del documento encontrado o error si no existe.
     """
     try:
-        return obtener_info_firma(id)
+        with limitador_odoo.admision():
+            return ORJSONResponse(obtener_info_firma(id))
+    except OdooSaturado as e:
+        raise rechazo_por_saturacion(e)
     except Exception as e:
         print("❌ Error en /info:", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/solicitudes", response_model=SolicitudesResponse, response_class=ORJSONResponse)
+def solicitudes(
+    tag: Optional[str] = Query(None, description="Nombre de la etiqueta de plantilla"),
+    estado: Optional[str] = Query(None, description="Estado en Odoo (shared, sent, signed, canceled, expired)"),
+    desde: Optional[datetime.date] = Query(None, description="Fecha de creación desde (YYYY-MM-DD)"),
+    hasta: Optional[datetime.date] = Query(None, description="Fecha de creación hasta (YYYY-MM-DD)"),
+    despues_de: int = Query(0, ge=0, description="Cursor: ID del último registro de la página anterior"),
+    limite: int = Query(50, ge=1, le=200, description="Cantidad de registros por página"),
+    campos: Optional[List[str]] = Query(None, description="Campos a devolver (repetible)"),
+):
+    """
+    Lista solicitudes de firma filtradas por etiqueta, estado y fecha, paginadas por ID.
+
+    Returns:
+        dict: 'items' y 'siguiente' (cursor para pedir la próxima página en 'despues_de').
+    """
+    try:
+        with limitador_odoo.admision():
+            return ORJSONResponse(listar_solicitudes_firma(tag, estado, desde, hasta, despues_de, limite, campos))
+    except OdooSaturado as e:
+        raise rechazo_por_saturacion(e)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print("❌ Error en /solicitudes:", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.get("/roles")
 def roles(id: int = Query(..., description="ID del rol de firma")):
     """
     Devuelve la información de un rol de firma (sign.item.role).
     """
     try:
-        return obtener_rol_por_id(id)
+        with limitador_odoo.admision():
+            return obtener_rol_por_id(id)
+    except OdooSaturado as e:
+        raise rechazo_por_saturacion(e)
     except Exception as e:
         print("❌ Error en /roles:", e)
         raise HTTPException(status_code=500, detail=str(e))
@@ -139,7 +317,10 @@ def tags(id: int = Query(..., description="ID de la etiqueta de plantilla")):
     Devuelve la información de una etiqueta de plantilla (sign.template.tag).
     """
     try:
-        return obtener_tag_por_id(id)
+        with limitador_odoo.admision():
+            return obtener_tag_por_id(id)
+    except OdooSaturado as e:
+        raise rechazo_por_saturacion(e)
     except Exception as e:
         print("❌ Error en /tags:", e)
         raise HTTPException(status_code=500, detail=str(e))
@@ -161,7 +342,10 @@ def edit_tag(id: int = Query(...), nuevo_nombre: str = Query(...)):
         HTTPException: Si ocurre un error en la actualización del nombre.
     """
     try:
-        return editar_tag(id, nuevo_nombre)
+        with limitador_odoo.admision():
+            return editar_tag(id, nuevo_nombre)
+    except OdooSaturado as e:
+        raise rechazo_por_saturacion(e)
     except Exception as e:
         print("❌ Error en /edit_tag:", e)
         raise HTTPException(status_code=500, detail=str(e))
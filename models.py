@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, model_validator
+from typing import Any, List, Optional, Union
 
 class SigningParty(BaseModel):
     """
@@ -22,3 +22,66 @@ class FirmaRequest(BaseModel):
     subject: str
     pages: List[int]
     tag: str
+
+class CancelacionMasivaRequest(BaseModel):
+    """
+    Solicitudes de firma a cancelar en bloque: por IDs, por etiqueta o ambos.
+    """
+    ids: Optional[List[int]] = None
+    tag: Optional[str] = None
+
+    @model_validator(mode="after")
+    def validar_criterio(self):
+        if not self.ids and not self.tag:
+            raise ValueError("Debe indicar 'ids' o 'tag'.")
+        return self
+
+
+# Odoo devuelve False en los campos vacíos, por eso varios campos aceptan bool.
+
+class InfoFirmaResponse(BaseModel):
+    """
+    Información detallada de una solicitud de firma (sign.request), devuelta por /info.
+    """
+    id: int
+    subject: Union[str, bool]
+    reference: Union[str, bool]
+    state: str
+    active: bool
+    display_name: Union[str, bool]
+    nb_wait: int
+    nb_closed: int
+    nb_total: int
+    progress: Union[str, int, float, bool]
+    validity: Union[str, bool]
+    reminder_enabled: bool
+    reminder: Union[int, bool]
+    last_reminder: Union[str, bool]
+    request_item_ids: List[int]
+    request_item_infos: Union[List[Any], bool]
+    create_date: Union[str, bool]
+    completion_date: Union[str, bool]
+    last_action_date: Union[str, bool]
+    template_id: Union[List[Union[int, str]], bool]
+    access_token: Union[str, bool]
+    rechazo_comentario: Optional[str] = None
+
+class SolicitudesResponse(BaseModel):
+    """
+    Página de solicitudes de firma devuelta por /solicitudes.
+    """
+    items: List[dict]
+    siguiente: Optional[int] = None  # Cursor para la próxima página
+
+class ResultadoCancelacion(BaseModel):
+    """
+    Resultado de la cancelación de una solicitud de firma.
+    """
+    id: int
+    message: str
+
+class CancelacionMasivaResponse(BaseModel):
+    """
+    Resultado por ID de /cancelar_masivo.
+    """
+    resultados: List[ResultadoCancelacion]
@@ -0,0 +1,34 @@
+# plazos.py
+
+import threading
+import time
+from contextlib import contextmanager
+
+# Plazo (time.monotonic) de la llamada a Odoo en curso en este hilo
+_local = threading.local()
+
+
+@contextmanager
+def con_plazo(plazo: float):
+    """
+    Fija el plazo absoluto (time.monotonic) de la llamada a Odoo que se hace
+    dentro del bloque, para que la espera en cola y el timeout de cada
+    intento no lo excedan.
+    """
+    anterior = getattr(_local, "plazo", None)
+    _local.plazo = plazo
+    try:
+        yield
+    finally:
+        _local.plazo = anterior
+
+
+def tiempo_restante(maximo: float) -> float:
+    """
+    Retorna el tiempo disponible para una espera: `maximo`, acotado por lo que
+    queda del plazo del hilo si hay uno fijado. Puede ser <= 0 si ya venció.
+    """
+    plazo = getattr(_local, "plazo", None)
+    if plazo is None:
+        return maximo
+    return min(maximo, plazo - time.monotonic())
@@ -0,0 +1,159 @@
+# resilience.py
+
+import random
+import threading
+import time
+import logging
+from limiter import OdooSaturado, es_error_de_sobrecarga
+from plazos import con_plazo
+
+# Operaciones de Odoo que se pueden repetir sin efectos secundarios.
+OPERACIONES_IDEMPOTENTES = {'search_read', 'search', 'read', 'search_count'}
+
+
+class CircuitoAbierto(OdooSaturado):
+    """
+    Se lanza cuando el circuit breaker considera que Odoo está caído y
+    rechaza la llamada sin enviarla.
+    """
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker de tres estados para las llamadas a Odoo.
+
+    - cerrado: las llamadas pasan normalmente.
+    - abierto: tras `umbral` fallos consecutivos se rechaza todo durante `espera` segundos.
+    - semiabierto: pasado ese tiempo se deja pasar una llamada de prueba;
+      si responde se cierra el circuito, si falla se vuelve a abrir.
+    """
+
+    def __init__(self, umbral: int, espera: float):
+        self.umbral = max(1, umbral)
+        self.espera = espera
+        self._fallos = 0
+        self._abierto_desde = None
+        self._prueba_desde = None
+        self._lock = threading.Lock()
+
+    def antes_de_llamar(self) -> bool:
+        """
+        Returns:
+            bool: True si la llamada es la prueba del estado semiabierto.
+
+        Raises:
+            CircuitoAbierto: Si el circuito está abierto o ya hay una prueba en curso.
+        """
+        with self._lock:
+            if self._abierto_desde is None:
+                return False
+
+            ahora = time.monotonic()
+            reapertura = self._abierto_desde + self.espera
+            if ahora < reapertura:
+                raise CircuitoAbierto("Odoo no está disponible, intente más tarde.",
+                                      status_code=503, retry_after=max(1, round(reapertura - ahora)))
+
+            # Semiabierto: una sola llamada de prueba a la vez
+            if self._prueba_desde is not None and ahora < self._prueba_desde + self.espera:
+                raise CircuitoAbierto("Odoo no está disponible, intente más tarde.",
+                                      status_code=503, retry_after=max(1, round(self.espera)))
+            self._prueba_desde = ahora
+            return True
+
+    def cancelar_prueba(self):
+        """
+        Libera la prueba del estado semiabierto cuando la llamada no llegó a
+        Odoo (p. ej. la rechazó el limitador), para que otra pueda probar.
+        """
+        with self._lock:
+            self._prueba_desde = None
+
+    def registrar_exito(self):
+        with self._lock:
+            if self._abierto_desde is not None:
+                logging.info("Circuito hacia Odoo cerrado nuevamente.")
+            self._fallos = 0
+            self._abierto_desde = None
+            self._prueba_desde = None
+
+    def registrar_fallo(self):
+        with self._lock:
+            self._fallos += 1
+            self._prueba_desde = None
+            if self._abierto_desde is not None or self._fallos >= self.umbral:
+                if self._abierto_desde is None:
+                    logging.warning(f"Circuito hacia Odoo abierto tras {self._fallos} fallos consecutivos.")
+                self._abierto_desde = time.monotonic()
+
+
+def es_idempotente(nombre: str, args: tuple) -> bool:
+    """
+    Indica si una llamada remota se puede reintentar sin riesgo.
+
+    En execute_kw la operación es el quinto argumento
+    (db, uid, password, modelo, operación, ...).
+    """
+    if nombre == 'execute_kw':
+        return len(args) > 4 and args[4] in OPERACIONES_IDEMPOTENTES
+    return nombre in ('authenticate', 'version')
+
+
+class ProxyResiliente:
+    """
+    Envuelve un proxy de Odoo con circuit breaker y reintentos con backoff
+    exponencial y jitter completo. Sólo se reintentan operaciones idempotentes
+    que fallan por errores de red/capacidad, y nunca más allá de `plazo_total`.
+
+    El plazo se propaga a cada intento (ver plazos.py): la espera en la cola
+    del limitador y el timeout de socket se acotan a lo que queda de él.
+    """
+
+    def __init__(self, proxy, circuito: CircuitBreaker, reintentos: int,
+                 backoff_base: float, backoff_maximo: float, plazo_total: float):
+        self._proxy = proxy
+        self._circuito = circuito
+        self._reintentos = reintentos
+        self._backoff_base = backoff_base
+        self._backoff_maximo = backoff_maximo
+        self._plazo_total = plazo_total
+
+    def __getattr__(self, nombre):
+        metodo = getattr(self._proxy, nombre)
+
+        def llamada(*args):
+            return self._llamar(nombre, metodo, args)
+
+        return llamada
+
+    def _llamar(self, nombre, metodo, args):
+        plazo = time.monotonic() + self._plazo_total
+        reintentos = self._reintentos if es_idempotente(nombre, args) else 0
+        intento = 0
+
+        while True:
+            es_prueba = self._circuito.antes_de_llamar()
+            try:
+                with con_plazo(plazo):
+                    resultado = metodo(*args)
+            except OdooSaturado:
+                # Rechazada antes de llegar a Odoo: no dice nada de su estado
+                if es_prueba:
+                    self._circuito.cancelar_prueba()
+                raise
+            except Exception as e:
+                if not es_error_de_sobrecarga(e):
+                    # Odoo respondió (p. ej. Fault): el servicio está disponible.
+                    self._circuito.registrar_exito()
+                    raise
+
+                self._circuito.registrar_fallo()
+                espera = random.uniform(0, min(self._backoff_maximo, self._backoff_base * 2 ** intento))
+                if intento >= reintentos or time.monotonic() + espera >= plazo:
+                    raise
+                intento += 1
+                logging.warning(f"Reintentando {nombre} en Odoo ({intento}/{reintentos}) tras error: {e}")
+                time.sleep(espera)
+            else:
+                self._circuito.registrar_exito()
+                return resultado
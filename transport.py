@@ -0,0 +1,380 @@
+# transport.py
+
+import itertools
+import queue
+import threading
+from contextlib import contextmanager
+from functools import partial
+from urllib.parse import urlsplit
+from xmlrpc.client import (Marshaller, Transport, SafeTransport, GzipDecodedResponse,
+                           Fault, ProtocolError, escape, getparser)
+
+import orjson
+import requests
+from requests.adapters import HTTPAdapter
+
+from plazos import tiempo_restante
+
+TRANSPORTES = ("xmlrpc", "jsonrpc")
+
+# Strings a partir de este largo (p. ej. 'datas' en base64) se codifican
+# directamente como un trozo propio del cuerpo, sin copias intermedias.
+UMBRAL_STRING_GRANDE = 64 * 1024
+
+# Tamaño de lectura de la respuesta y del buffer de texto del parser.
+# La librería estándar lee de a 1 KB, lo que para un PDF de varios MB
+# significa miles de llamadas a feed() y callbacks de texto.
+TAMANO_LECTURA = 256 * 1024
+TAMANO_BUFFER_TEXTO = 1024 * 1024
+
+
+class _CuerpoSolicitud:
+    """
+    Acumula el cuerpo XML-RPC como una lista de trozos de bytes.
+
+    El texto pequeño se agrupa y se codifica de una vez; cada string grande
+    se codifica una sola vez en su propio trozo, evitando los "".join y
+    .encode() sobre el cuerpo completo que hace xmlrpc.client.dumps.
+    """
+
+    def __init__(self):
+        self.trozos = []
+        self._pendiente = []
+        self.write = self._pendiente.append
+
+    def _volcar(self):
+        if self._pendiente:
+            self.trozos.append("".join(self._pendiente).encode("utf-8", "xmlcharrefreplace"))
+            self._pendiente.clear()
+
+    def write_grande(self, texto: str):
+        self._volcar()
+        self.trozos.append(texto.encode("utf-8", "xmlcharrefreplace"))
+
+    def cerrar(self) -> list:
+        self._volcar()
+        return self.trozos
+
+
+class _MarshallerRapido(Marshaller):
+    """
+    Marshaller que envía los strings grandes al cuerpo sin pasar por el
+    buffer de texto. escape() no copia cuando no hay caracteres especiales,
+    que es el caso del base64.
+    """
+
+    dispatch = dict(Marshaller.dispatch)
+
+    def __init__(self, cuerpo: _CuerpoSolicitud):
+        super().__init__("utf-8", allow_none=False)
+        self._cuerpo = cuerpo
+
+    def dump_unicode(self, value, write, escape=escape):
+        write("<value><string>")
+        if len(value) >= UMBRAL_STRING_GRANDE:
+            self._cuerpo.write_grande(escape(value))
+        else:
+            write(escape(value))
+        write("</string></value>\n")
+    dispatch[str] = dump_unicode
+
+    def volcar(self, value):
+        try:
+            dump = self.dispatch[type(value)]
+        except KeyError:
+            raise TypeError(f"cannot marshal {type(value)} objects")
+        dump(self, value, self._cuerpo.write)
+
+
+def dumps_rapido(params: tuple, methodname: str) -> list:
+    """
+    Serializa una llamada XML-RPC (equivalente a xmlrpc.client.dumps).
+
+    Returns:
+        list: Trozos de bytes del cuerpo, listos para enviarse sin unir.
+    """
+    cuerpo = _CuerpoSolicitud()
+    marshaller = _MarshallerRapido(cuerpo)
+    write = cuerpo.write
+
+    write("<?xml version='1.0'?>\n<methodCall>\n<methodName>")
+    write(methodname)
+    write("</methodName>\n<params>\n")
+    for param in params:
+        write("<param>\n")
+        marshaller.volcar(param)
+        write("</param>\n")
+    write("</params>\n</methodCall>\n")
+    return cuerpo.cerrar()
+
+
+class _TransporteOdoo:
+    """
+    Comportamiento común de los transportes hacia Odoo:
+
+    - timeout de socket en cada llamada, acotado al plazo de la llamada en
+      curso, para que un Odoo colgado no bloquee indefinidamente el hilo;
+    - envío del cuerpo por trozos (ver dumps_rapido);
+    - lectura de la respuesta en bloques grandes y parser con buffer de texto,
+      para que los strings grandes lleguen en pocos trozos.
+    """
+
+    def __init__(self, timeout: float, **kwargs):
+        super().__init__(**kwargs)
+        self.timeout = timeout
+
+    def make_connection(self, host):
+        timeout = tiempo_restante(self.timeout)
+        if timeout <= 0:
+            raise TimeoutError("Plazo de la llamada a Odoo agotado.")
+
+        conexion = super().make_connection(host)
+        conexion.timeout = timeout
+        if conexion.sock is not None:
+            # Conexión keep-alive reutilizada: el timeout ya se aplicó al conectar
+            conexion.sock.settimeout(timeout)
+        return conexion
+
+    def send_content(self, connection, request_body):
+        if not isinstance(request_body, list):
+            return super().send_content(connection, request_body)
+
+        connection.putheader("Content-Length", str(sum(map(len, request_body))))
+        connection.endheaders()
+        for trozo in request_body:
+            connection.send(trozo)
+
+    def getparser(self):
+        parser, unmarshaller = getparser(use_datetime=self._use_datetime,
+                                         use_builtin_types=self._use_builtin_types)
+        expat = getattr(parser, "_parser", None)
+        if expat is not None:
+            expat.buffer_text = True
+            expat.buffer_size = TAMANO_BUFFER_TEXTO
+        return parser, unmarshaller
+
+    def parse_response(self, response):
+        if hasattr(response, "getheader") and response.getheader("Content-Encoding", "") == "gzip":
+            stream = GzipDecodedResponse(response)
+        else:
+            stream = response
+
+        parser, unmarshaller = self.getparser()
+        while True:
+            data = stream.read(TAMANO_LECTURA)
+            if not data:
+                break
+            if self.verbose:
+                print("body:", repr(data))
+            parser.feed(data)
+
+        if stream is not response:
+            stream.close()
+        parser.close()
+        return unmarshaller.close()
+
+
+class TransporteConTimeout(_TransporteOdoo, Transport):
+    """Transporte XML-RPC (http) hacia Odoo."""
+
+
+class TransporteSeguroConTimeout(_TransporteOdoo, SafeTransport):
+    """Transporte XML-RPC (https) hacia Odoo."""
+
+
+class PoolTransportes:
+    """
+    Pool de transportes XML-RPC hacia un mismo host. Cada transporte mantiene
+    una conexión keep-alive; una llamada toma uno libre (o crea uno nuevo) y lo
+    devuelve al terminar, así las conexiones se reutilizan entre requests y
+    entre los servicios 'common' y 'object'.
+    """
+
+    def __init__(self, fabrica, maximo: int):
+        self._fabrica = fabrica
+        self._maximo = maximo
+        self._libres = queue.LifoQueue()
+
+    @contextmanager
+    def transporte(self):
+        try:
+            transporte = self._libres.get_nowait()
+        except queue.Empty:
+            transporte = self._fabrica()
+        try:
+            yield transporte
+        finally:
+            if self._libres.qsize() < self._maximo:
+                self._libres.put(transporte)
+            else:
+                transporte.close()
+
+    def cerrar(self):
+        while True:
+            try:
+                self._libres.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+_pools_xmlrpc = {}
+_pools_lock = threading.Lock()
+
+
+class ProxyXmlRpc:
+    """
+    Reemplazo mínimo de xmlrpc.client.ServerProxy que serializa con
+    dumps_rapido. Expone la misma interfaz: proxy.metodo(*params).
+    """
+
+    def __init__(self, uri: str, pool: PoolTransportes):
+        partes = urlsplit(uri)
+        self._host = partes.netloc
+        self._handler = partes.path or "/RPC2"
+        if partes.query:
+            self._handler += f"?{partes.query}"
+        self._pool = pool
+
+    def __getattr__(self, nombre):
+        if nombre.startswith("_"):
+            raise AttributeError(nombre)
+        return partial(self._llamar, nombre)
+
+    def _llamar(self, metodo, *params):
+        with self._pool.transporte() as transporte:
+            respuesta = transporte.request(self._host, self._handler,
+                                           dumps_rapido(params, metodo))
+        if len(respuesta) == 1:
+            return respuesta[0]
+        return respuesta
+
+
+def crear_proxy_xmlrpc(uri: str, timeout: float, conexiones: int = 10) -> ProxyXmlRpc:
+    """
+    Crea el proxy XML-RPC con el transporte adecuado al esquema de la URL,
+    usando el pool de conexiones compartido para ese host.
+
+    Args:
+        uri (str): URL completa del endpoint XML-RPC.
+        timeout (float): Timeout en segundos para conectar y leer cada respuesta.
+        conexiones (int): Máximo de conexiones ociosas que conserva el pool.
+
+    Returns:
+        ProxyXmlRpc: Proxy XML-RPC con timeout y codec optimizado.
+    """
+    partes = urlsplit(uri)
+    clase = TransporteSeguroConTimeout if partes.scheme == "https" else TransporteConTimeout
+    with _pools_lock:
+        pool = _pools_xmlrpc.get((partes.scheme, partes.netloc, timeout))
+        if pool is None:
+            pool = PoolTransportes(partial(clase, timeout), conexiones)
+            _pools_xmlrpc[(partes.scheme, partes.netloc, timeout)] = pool
+    return ProxyXmlRpc(uri, pool)
+
+
+_sesion_jsonrpc = None
+_sesion_lock = threading.Lock()
+
+
+def _obtener_sesion(conexiones: int) -> requests.Session:
+    """
+    Retorna la sesión HTTP compartida para JSON-RPC, creándola en el primer uso.
+    La sesión mantiene un pool de conexiones keep-alive hacia Odoo.
+    """
+    global _sesion_jsonrpc
+    with _sesion_lock:
+        if _sesion_jsonrpc is None:
+            sesion = requests.Session()
+            adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=conexiones)
+            sesion.mount("http://", adaptador)
+            sesion.mount("https://", adaptador)
+            _sesion_jsonrpc = sesion
+        return _sesion_jsonrpc
+
+
+class ProxyJsonRpc:
+    """
+    Proxy hacia el endpoint /jsonrpc de Odoo con la misma interfaz que
+    ProxyXmlRpc: proxy.metodo(*params) llama a `metodo` del servicio dado
+    ('common' u 'object'). Serializa y parsea con orjson.
+
+    Los errores de Odoo se lanzan como xmlrpc.client.Fault y los HTTP no 2xx
+    como ProtocolError, igual que en XML-RPC, para que el resto del cliente
+    (reintentos, circuit breaker) no dependa del transporte elegido.
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, url: str, servicio: str, timeout: float, conexiones: int = 10):
+        self._url = f"{url}/jsonrpc"
+        self._servicio = servicio
+        self._timeout = timeout
+        self._conexiones = conexiones
+
+    def __getattr__(self, nombre):
+        if nombre.startswith("_"):
+            raise AttributeError(nombre)
+        return partial(self._llamar, nombre)
+
+    def _llamar(self, metodo, *params):
+        timeout = tiempo_restante(self._timeout)
+        if timeout <= 0:
+            raise TimeoutError("Plazo de la llamada a Odoo agotado.")
+
+        cuerpo = orjson.dumps({
+            "jsonrpc": "2.0",
+            "method": "call",
+            "params": {"service": self._servicio, "method": metodo, "args": params},
+            "id": next(self._ids),
+        })
+        respuesta = _obtener_sesion(self._conexiones).post(
+            self._url, data=cuerpo, timeout=timeout,
+            headers={"Content-Type": "application/json"},
+        )
+        if not 200 <= respuesta.status_code < 300:
+            raise ProtocolError(self._url, respuesta.status_code, respuesta.reason,
+                                dict(respuesta.headers))
+
+        resultado = orjson.loads(respuesta.content)
+        error = resultado.get("error")
+        if error:
+            datos = error.get("data") or {}
+            raise Fault(error.get("code", 0), datos.get("message") or error.get("message", ""))
+        return resultado.get("result")
+
+
+def crear_proxy(url: str, servicio: str, transporte: str, timeout: float, conexiones: int = 10):
+    """
+    Crea el proxy hacia un servicio de Odoo con el transporte configurado.
+
+    Args:
+        url (str): URL base de Odoo.
+        servicio (str): 'common' u 'object'.
+        transporte (str): 'xmlrpc' o 'jsonrpc'.
+        timeout (float): Timeout en segundos por llamada.
+        conexiones (int): Tamaño del pool de conexiones.
+
+    Returns:
+        ProxyXmlRpc | ProxyJsonRpc: Proxy con interfaz proxy.metodo(*params).
+
+    Raises:
+        ValueError: Si el transporte no es soportado.
+    """
+    if transporte == "jsonrpc":
+        return ProxyJsonRpc(url, servicio, timeout, conexiones)
+    if transporte == "xmlrpc":
+        return crear_proxy_xmlrpc(f"{url}/xmlrpc/2/{servicio}", timeout, conexiones)
+    raise ValueError(f"Transporte de Odoo no soportado: {transporte}. Opciones: {', '.join(TRANSPORTES)}")
+
+
+def cerrar_conexiones():
+    """Cierra las conexiones ociosas de los pools XML-RPC y la sesión JSON-RPC."""
+    global _sesion_jsonrpc
+    with _pools_lock:
+        for pool in _pools_xmlrpc.values():
+            pool.cerrar()
+        _pools_xmlrpc.clear()
+    with _sesion_lock:
+        if _sesion_jsonrpc is not None:
+            _sesion_jsonrpc.close()
+            _sesion_jsonrpc = None